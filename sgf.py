@@ -1,38 +1,35 @@
 #!/usr/bin/python3
 
+import codecs
 import re
-from abc import ABCMeta, abstractmethod
+from functools import lru_cache
 
 class Property(object):
-    __metaclass__ = ABCMeta
-
     def __init__(self):
         self.values = []
 
     def serialize(self):
-        s = self.prop_ident
-        for prop_value in self.values:
-            s += "[{}]".format(prop_value)
-        return s
+        return self.prop_ident + "".join(f"[{v}]" for v in self.values)
 
     @classmethod
-    @abstractmethod
     def deserialize(cls, data):
-        # Skip any leading whitespace.
-        data = data.lstrip()
-        if not data.startswith(cls.prop_ident):
+        # Match the property identifier and PropValue part, allowing for
+        # leading and separating whitespace.
+        m = _build_ident_re(cls.prop_ident).match(data)
+        if not m:
             raise ValueError("Unexpected property identifier.")
 
-        # Skip the property identifier and trailing whitespace.
-        data = data[len(cls.prop_ident):].lstrip()
-
-        # Match the PropValue part.
-        regex = '|'.join([Number.regex, SimpleText.regex])
-        m = re.match('\[({})\]'.format(regex), data)
-        if not m or m.lastindex != 1:
+        if m.lastindex != 1:
             raise ValueError("Invalid property value.")
 
-        return m.group(1)
+        return m.group('v')
+
+    @classmethod
+    def deserialize_cached(cls, data):
+        # Game records repeat the same properties a lot, so identical input
+        # shares one deserialized instance.  Callers must therefore treat
+        # the returned property, including its values, as read-only.
+        return _deserialize_cached(cls, data)
 
     def __str__(self):
         return self.serialize()
@@ -134,29 +131,26 @@ class Compose(object):
             self.values = [arg[0], arg[1]]
 
         # Convert to simpletext with compose = True to ensure proper
-        # handling of ':' characters within SimpleText.
-        if isinstance(self.values[0], SimpleText):
+        # handling of ':' characters within SimpleText.  Values that already
+        # are compose SimpleTexts are kept as is.
+        if isinstance(self.values[0], SimpleText) and not self.values[0]._compose:
             self.values[0] = SimpleText(self.values[0], compose=True)
 
-        if isinstance(self.values[1], SimpleText):
+        if isinstance(self.values[1], SimpleText) and not self.values[1]._compose:
             self.values[1] = SimpleText(self.values[1], compose=True)
 
     def __str__(self):
         return self.serialize()
 
     def serialize(self):
-        return "{}:{}".format(self.values[0], self.values[1])
+        return f"{self.values[0]}:{self.values[1]}"
 
 class Number(object):
     regex = r"[+-]?\d+"
+    compiled_value_re = re.compile(regex)
 
     def __init__(self, o):
-        if isinstance(o, Number):
-            self.value = o.value
-        elif isinstance(o, str):
-            self.value = int(o)
-        else:
-            self.value = o
+        self.value = o.value if isinstance(o, Number) else int(o)
 
     def __str__(self):
         return str(self.value)
@@ -199,32 +193,30 @@ class Text(object):
 
     @staticmethod
     def encode(s, encoding="ISO-8859-1", compose=False):
-        # Let splitlines() handle different unicode based line breaks.
-        # This avoids having to enumerate unicode line breaks explicitly.
-        need_escape = ":]"[not compose:]
-        linebreak   = lambda c: len(c.splitlines()[0]) == 0
-        whitespace  = lambda c: re.match('\s', c, re.UNICODE) is not None
-        escape      = False
-        text        = ""
-        for i, c in enumerate(s):
-            if not escape and c == '\\':
-                escape = True
-            elif not escape and c in need_escape:
+        # Nothing to escape or convert, so the text is used as is.
+        if _TEXT_TOKEN_RE.search(s) is None:
+            return _get_encoder(encoding)(s)[0]
+
+        need_escape = _NEED_ESC_COMPOSE if compose else _NEED_ESC_PLAIN
+
+        def replace(m):
+            c = m.group(0)
+            if c[0] == '\\':
+                # We have a trailing escape sequence, so we error out.
+                if len(c) == 1:
+                    raise ValueError("Unexpected escape sequence.")
+                c = c[1]
+                if c in _LINEBREAKS:
+                    return ""
+            elif c in need_escape:
                 raise ValueError("Unescaped use of '{}'.".format(c))
-            elif escape and linebreak(c):
-                escape = False
-            elif whitespace(c) and not linebreak(c):
-                escape = False
-                text += ' '
-            else:
-                escape = False
-                text += c
 
-        # We have a trailing escape sequence, so we error out.
-        if escape:
-            raise ValueError("Unexpected escape sequence.")
+            if c.isspace() and c not in _LINEBREAKS:
+                return ' '
+            return c
 
-        return text.encode(encoding)
+        text = _TEXT_TOKEN_RE.sub(replace, s)
+        return _get_encoder(encoding)(text)[0]
 
 class SimpleText(object):
     """3.3. SimpleText
@@ -247,6 +239,7 @@ class SimpleText(object):
 
     # XXX: handle escape sequences and ':'
     regex = r'[^\]]*'
+    compiled_value_re = re.compile(regex)
 
     def __init__(self, o, encoding=None, compose=False):
         if isinstance(o, SimpleText):
@@ -256,6 +249,7 @@ class SimpleText(object):
             if encoding is None: encoding = "ISO-8859-1"
             self._data = self.encode(o, encoding, compose)
         self._encoding = encoding
+        self._compose  = compose
 
     @property
     def data(self):
@@ -266,31 +260,65 @@ class SimpleText(object):
 
     @staticmethod
     def encode(s, encoding="ISO-8859-1", compose=False):
-        # Let splitlines() handle different unicode based line breaks.
-        # This avoids having to enumerate unicode line breaks explicitly.
-        need_escape = ":]"[not compose:]
-        linebreak   = lambda c: len(c.splitlines()[0]) == 0
-        escape      = False
-        text        = ""
-        for i, c in enumerate(s):
-            if not escape and c == '\\':
-                escape = True
-            elif not escape and c in need_escape:
+        # Without escapes or characters needing them, all that is left to
+        # do is converting whitespace to space.
+        if '\\' not in s and ']' not in s and (not compose or ':' not in s):
+            return _get_encoder(encoding)(s.translate(_WS_TO_SPACE))[0]
+
+        need_escape = _NEED_ESC_COMPOSE if compose else _NEED_ESC_PLAIN
+
+        def replace(m):
+            c = m.group(0)
+            if c[0] == '\\':
+                # We have a trailing escape sequence, so we error out.
+                if len(c) == 1:
+                    raise ValueError("Unexpected escape sequence.")
+                c = c[1]
+                if c in _LINEBREAKS:
+                    return ""
+            elif c in need_escape:
                 raise ValueError("Unescaped use of '{}'.".format(c))
-            elif escape and linebreak(c):
-                escape = False
-            else:
-                escape = False
-                text += c
 
-        # We have a trailing escape sequence, so we error out.
-        if escape:
-            raise ValueError("Unexpected escape sequence.")
+            # All remaining whitespace, linebreaks included, becomes a space.
+            if c.isspace():
+                return ' '
+            return c
+
+        text = _TEXT_TOKEN_RE.sub(replace, s)
+        return _get_encoder(encoding)(text)[0]
+
+# The PropValue part of a property, composed once at import time.
+_PROPVALUE_RE  = re.compile(r'\[(?P<v>' + Number.regex + '|' + SimpleText.regex + r')\]')
+
+# Matches everything Text and SimpleText encoding has to act on: an escape
+# sequence (or a trailing lone "\"), a character that may need escaping, or
+# whitespace other than space.  All other characters are copied verbatim.
+_TEXT_TOKEN_RE = re.compile(r'\\.?|[\]:]|[^\S ]', re.DOTALL)
+
+# Characters that must be escaped in (Simple)Text, with and without compose.
+_NEED_ESC_COMPOSE = frozenset(':]')
+_NEED_ESC_PLAIN   = frozenset(']')
+
+# The line breaks recognized by str.splitlines().
+_LINEBREAKS = frozenset('\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029')
+
+# Maps all whitespace recognized by str.isspace() to space.
+_WS_TO_SPACE = {ord(c): ord(' ') for c in
+    '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f\x85\xa0\u1680\u2000\u2001\u2002\u2003'
+    '\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000'}
+
+@lru_cache(maxsize=None)
+def _build_ident_re(prop_ident):
+    return re.compile(r'\s*' + re.escape(prop_ident) +
+                      r'\s*(?:' + _PROPVALUE_RE.pattern + ')?')
 
-        # Let the '\s' regex handle all whitespace in this encoding.
-        text = re.sub('\s', ' ', text, flags=re.UNICODE)
+@lru_cache(maxsize=4096)
+def _deserialize_cached(cls, data):
+    return cls.deserialize(data)
 
-        return text.encode(encoding)
+@lru_cache(maxsize=16)
+def _get_encoder(encoding):
+    return codecs.getencoder(encoding)
 
 if __name__ == '__main__':
     print(SZ(Compose((19, 18))))